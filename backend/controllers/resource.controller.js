@@ -101,6 +101,7 @@ exports.addResource = async (req, res) => {
 
     // Invalidate cache (simple approach: clear all for now, or we could leave it if we remove caching from get)
     await cacheService.del("all_resources");
+    await cacheService.publishInvalidation("resources");
 
     res.status(201).json({ message: "Resource added successfully", resource });
 
@@ -146,6 +147,7 @@ exports.bulkAddResources = async (req, res) => {
 
     // Invalidate cache
     await cacheService.del("all_resources");
+    await cacheService.publishInvalidation("resources");
 
     res.status(201).json({
       message: "Resources added successfully",
@@ -311,6 +313,7 @@ exports.updateResource = async (req, res) => {
 
     // Invalidate cache if public
     await cacheService.del("all_resources");
+    await cacheService.publishInvalidation("resources");
 
     res.json({ message: "Resource updated successfully", resource: updatedResource });
 
@@ -353,6 +356,7 @@ exports.deleteResource = async (req, res) => {
 
     // Invalidate cache
     await cacheService.del("all_resources");
+    await cacheService.publishInvalidation("resources");
 
     res.json({ message: "Resource deleted successfully" });
 
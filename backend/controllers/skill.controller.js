@@ -50,6 +50,7 @@ exports.addSkill = async (req, res) => {
 
     // Invalidate company-specific cache
     await cacheService.del(`all_skills_${company}`);
+    await cacheService.publishInvalidation("skills");
 
     res.status(201).json({ message: "Skill added successfully", skill });
 
@@ -157,6 +158,7 @@ exports.updateSkill = async (req, res) => {
 
     // Invalidate cache
     await cacheService.del(`all_skills_${req.user.company}`);
+    await cacheService.publishInvalidation("skills");
 
     res.json({ message: "Skill updated successfully", skill });
 
@@ -206,6 +208,7 @@ exports.bulkAddSkills = async (req, res) => {
 
     // Invalidate cache
     await cacheService.del(`all_skills_${company}`);
+    await cacheService.publishInvalidation("skills");
 
     res.status(201).json({
       message: "Skills added successfully",
@@ -247,6 +250,7 @@ exports.deleteSkill = async (req, res) => {
 
     // Invalidate cache
     await cacheService.del(`all_skills_${req.user.company}`);
+    await cacheService.publishInvalidation("skills");
 
     res.json({ message: "Skill deleted successfully" });
 
@@ -2,6 +2,7 @@ const redisClient = require('../config/redis');
 const logger = require('../config/logger');
 
 const DEFAULT_TTL = 3600; // Default Time-To-Live: 1 hour in seconds
+const INVALIDATION_CHANNEL = 'cache:invalidate'; // Subscribed to by recommender workers
 
 /**
  * Cache Service
@@ -65,8 +66,26 @@ const del = async (key) => {
     }
 };
 
+/**
+ * Notify recommender workers of a collection change
+ * ----------------------------------------------------
+ * Publishes the collection name on the invalidation channel so
+ * Python workers drop their in-process copy of it immediately
+ * instead of waiting for their TTL to expire.
+ * 
+ * @param {string} collection - Changed collection ("skills" or "resources")
+ */
+const publishInvalidation = async (collection) => {
+    try {
+        await redisClient.publish(INVALIDATION_CHANNEL, collection);
+    } catch (error) {
+        logger.error(`Cache PUBLISH error for ${collection}:`, error);
+    }
+};
+
 module.exports = {
     get,
     set,
-    del
+    del,
+    publishInvalidation
 };
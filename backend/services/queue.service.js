@@ -10,6 +10,15 @@ const logger = require('../config/logger');
 
 const QUEUE_NAME = 'recommendation_queue';
 
+/**
+ * Encode a MongoDB ObjectId as base64 of its 12 raw bytes, which the
+ * worker turns back into an ObjectId without parsing hex.
+ *
+ * @param {ObjectId|string} id - ObjectId or its 24-character hex string
+ * @returns {string} - Base64-encoded id
+ */
+const encodeObjectId = (id) => Buffer.from(String(id), 'hex').toString('base64');
+
 /**
  * Add a recommendation job to the queue.
  * 
@@ -20,7 +29,13 @@ const addJob = async (jobData) => {
     try {
         const job = JSON.stringify({
             id: Date.now().toString(),
-            data: jobData,
+            data: {
+                ...jobData,
+                // Raw-bytes ids for the worker; the hex ids stay for logging
+                userOid: encodeObjectId(jobData.userId),
+                idpOid: encodeObjectId(jobData.idpId)
+            },
+            attempts: 0, // Incremented by the worker on each failed try
             timestamp: new Date().toISOString()
         });
 
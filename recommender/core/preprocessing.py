@@ -6,7 +6,7 @@ for the recommendation system.
 """
 
 import numpy as np
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from collections import defaultdict
 
 
@@ -277,4 +277,78 @@ class DataPreprocessor:
             skill_id = str(skill.get('_id', ''))
             mapping[skill_id] = idx
         return mapping
-
+    
+    def build_resource_arrays(self, resource_features: Dict[str, Dict[str, Any]],
+                              skill_mapping: Dict[str, int]) -> Tuple[List[str], Dict[str, np.ndarray]]:
+        """
+        Convert resource features into a Structure-of-Arrays layout.
+        
+        Instead of one dictionary per resource, each feature becomes one
+        contiguous NumPy array (one entry per resource), so the ranker can
+        score all resources with vectorized operations that scan memory
+        sequentially.
+        
+        Args:
+            resource_features: Output of prepare_resource_features
+            skill_mapping: Dictionary mapping skill ID strings to matrix indices
+        
+        Returns:
+            Tuple (resource_ids, arrays) where resource_ids[i] is the ID of
+            the resource in row i and arrays contains:
+            - skill_idx: int32, matrix index of the resource's skill (-1 = unknown)
+            - difficulty: float32 (1.0-3.0)
+            - type: float32 (0.5-1.2)
+        """
+        resource_ids = list(resource_features.keys())
+        features = list(resource_features.values())
+        
+        arrays = {
+            'skill_idx': np.array([skill_mapping.get(f['skillId'], -1) for f in features], dtype=np.int32),
+            'difficulty': np.array([f['difficulty'] for f in features], dtype=np.float32),
+            'type': np.array([f['type'] for f in features], dtype=np.float32)
+        }
+        return resource_ids, arrays
+    
+    def build_skill_index_arrays(self, user_skills: List[Dict[str, Any]],
+                                 skills_to_improve: List[Dict[str, Any]],
+                                 skill_mapping: Dict[str, int]) -> Dict[str, np.ndarray]:
+        """
+        Map a user's skills and improvement targets to similarity-matrix indices.
+        
+        Skills missing from the mapping are dropped; for duplicate skills the
+        last entry wins (matching ResourceRanker's lookup maps).
+        
+        Args:
+            user_skills: List of user skills, each with 'skillId' (or 'skill') and 'level'
+            skills_to_improve: List of skills to improve, each with 'skillId',
+                               'gap' and 'currentLevel'
+            skill_mapping: Dictionary mapping skill ID strings to matrix indices
+        
+        Returns:
+            Dictionary of arrays:
+            - user_skill_idx (int32) / user_skill_levels (float32, normalized 0-1)
+            - improve_skill_idx (int32) / improve_gaps (float32) /
+              improve_levels (float32, normalized current level 0-1)
+        """
+        user_levels = {}
+        for skill in user_skills:
+            skill_id = str(skill.get('skillId') or skill.get('skill', {}).get('_id', ''))
+            if skill_id in skill_mapping:
+                user_levels[skill_mapping[skill_id]] = (skill.get('level', 1) - 1) / 9.0
+        
+        improvements = {}
+        for skill_info in skills_to_improve:
+            skill_id = skill_info.get('skillId', '')
+            if skill_id in skill_mapping:
+                improvements[skill_mapping[skill_id]] = (
+                    skill_info.get('gap', 0.0),
+                    (skill_info.get('currentLevel', 1) - 1) / 9.0
+                )
+        
+        return {
+            'user_skill_idx': np.array(list(user_levels.keys()), dtype=np.int32),
+            'user_skill_levels': np.array(list(user_levels.values()), dtype=np.float32),
+            'improve_skill_idx': np.array(list(improvements.keys()), dtype=np.int32),
+            'improve_gaps': np.array([gap for gap, _ in improvements.values()], dtype=np.float32),
+            'improve_levels': np.array([level for _, level in improvements.values()], dtype=np.float32)
+        }
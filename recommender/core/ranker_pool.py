@@ -0,0 +1,155 @@
+"""
+Ranker Process Pool
+-------------------
+Runs ResourceRanker in separate processes so several jobs can be ranked
+in parallel on a multicore host instead of contending for the GIL.
+
+The similarity matrix and the resource feature arrays are placed in
+shared memory by the parent (see share_arrays), so every pool process
+maps the same physical buffers instead of holding its own copy. A job
+only ships the shared-memory descriptors and its per-user inputs.
+"""
+
+import os
+import sys
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Any, Optional, Tuple
+
+import numba
+import numpy as np
+
+from core.resource_ranker import ResourceRanker
+
+# Each array starts on its own cache line
+_ALIGNMENT = 64
+
+# Per-process state, populated by _init_ranker and _attach
+_state = {
+    "ranker": None,
+    "similarity": (None, None, None),  # (shm name, SharedMemory, arrays)
+    "resources": (None, None, None)
+}
+
+
+def share_arrays(arrays: Dict[str, np.ndarray]) -> Tuple[SharedMemory, Dict[str, Any]]:
+    """
+    Copy named arrays into a single new shared memory block.
+
+    Each array is stored contiguously (Structure-of-Arrays), so consumers
+    get tight, sequentially scannable columns.
+
+    Args:
+        arrays: Dictionary of name -> NumPy array
+
+    Returns:
+        Tuple (shm, descriptor). The caller owns shm and must close() and
+        unlink() it once no job uses it; descriptor is a small picklable
+        dictionary that attach_arrays() turns back into arrays.
+    """
+    layout = []
+    size = 0
+    for name, array in arrays.items():
+        offset = -(-size // _ALIGNMENT) * _ALIGNMENT
+        layout.append((name, array.dtype.str, array.shape, offset))
+        size = offset + array.nbytes
+
+    shm = SharedMemory(create=True, size=max(size, 1))
+    for (name, dtype, shape, offset), array in zip(layout, arrays.values()):
+        np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)[...] = array
+
+    return shm, {"name": shm.name, "layout": layout}
+
+
+def attach_arrays(descriptor: Dict[str, Any]) -> Tuple[SharedMemory, Dict[str, np.ndarray]]:
+    """
+    Map a block created by share_arrays() into this process.
+
+    Returns:
+        Tuple (shm, arrays) where arrays are zero-copy views of the block
+    """
+    shm = SharedMemory(name=descriptor["name"])
+    arrays = {
+        name: np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+        for name, dtype, shape, offset in descriptor["layout"]
+    }
+    return shm, arrays
+
+
+def _init_ranker():
+    """Pool initializer: create this process's ranker."""
+    # Parallelism comes from the pool's processes; one Numba thread each
+    # avoids N processes x N threads oversubscribing the cores
+    numba.set_num_threads(1)
+    _state["ranker"] = ResourceRanker()
+
+
+def _attach(kind: str, descriptor: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """Get the arrays for a shared block, re-attaching when its version changed."""
+    name, old_shm, arrays = _state[kind]
+    if name != descriptor["name"]:
+        shm, arrays = attach_arrays(descriptor)
+        _state[kind] = (descriptor["name"], shm, arrays)
+        if old_shm is not None:
+            try:
+                old_shm.close()
+            except BufferError:
+                # A view is still referenced somewhere; the mapping is
+                # released when it is garbage collected instead
+                pass
+    return arrays
+
+
+def rank(payload: Dict[str, Any]) -> Tuple[list, list]:
+    """
+    Rank resources for one job inside a pool process.
+
+    Args:
+        payload: Dictionary containing:
+            - similarity: share_arrays descriptor with a 'similarity' matrix
+            - similarity_scale: Factor converting matrix entries to [0, 1]
+            - resources: share_arrays descriptor with the resource arrays
+            - skill_inputs: Output of DataPreprocessor.build_skill_index_arrays
+            - top_k: Number of results to return
+            - similar_skills_per_goal: Candidate selection breadth (see
+              ResourceRanker.rank_resource_arrays)
+
+    Returns:
+        Tuple (indices, scores) of resource rows, best first
+    """
+    similarity_matrix = _attach("similarity", payload["similarity"])["similarity"]
+    resource_arrays = _attach("resources", payload["resources"])
+
+    indices, scores = _state["ranker"].rank_resource_arrays(
+        resource_arrays=resource_arrays,
+        similarity_matrix=similarity_matrix,
+        similarity_scale=payload["similarity_scale"],
+        top_k=payload["top_k"],
+        similar_skills_per_goal=payload["similar_skills_per_goal"],
+        **payload["skill_inputs"]
+    )
+    return indices.tolist(), scores.tolist()
+
+
+def create_ranker_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    Create the process pool used to run rank().
+
+    Processes are started by a forkserver (spawn on Windows) rather than
+    forked from the caller: the pool starts lazily, by which time the
+    caller runs threads (logging, asyncio.to_thread) that a fork would copy
+    in an arbitrary state. The forkserver imports the caller's __main__
+    module once and forks the processes from there, so that module must
+    only create the pool (or start anything else) under its
+    `if __name__ == "__main__"` guard.
+
+    Args:
+        max_workers: Number of processes (default: one per CPU core)
+    """
+    method = "spawn" if sys.platform == "win32" else "forkserver"
+    return ProcessPoolExecutor(
+        max_workers=max_workers or os.cpu_count(),
+        mp_context=multiprocessing.get_context(method),
+        initializer=_init_ranker
+    )
@@ -11,9 +11,67 @@ Ranks learning resources based on multiple factors:
 
 import json
 from pathlib import Path
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 
 import numpy as np
+from numba import njit, prange
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _score_resource_arrays(similarity_matrix, similarity_scale,
+                           skill_idx, difficulty, resource_type,
+                           user_skill_idx, user_skill_levels,
+                           improve_skill_idx, improve_gaps,
+                           gap_by_skill, is_improvement, level_by_skill,
+                           weights, difficulty_offset):
+    """
+    Score every resource (see ResourceRanker.rank_resource_arrays).
+    
+    Compiled to native SIMD code and parallelized across resources.
+    Per-skill tables have a trailing zero slot used for unknown skills (-1).
+    weights holds the skill_gap, skill_relevance, difficulty_match,
+    resource_type and skill_similarity weights, in that order.
+    """
+    n_resources = skill_idx.shape[0]
+    unknown_slot = gap_by_skill.shape[0] - 1
+    scores = np.empty(n_resources)
+    
+    for i in prange(n_resources):
+        skill = skill_idx[i]
+        slot = skill if skill >= 0 else unknown_slot
+        
+        skill_relevance = 0.0
+        skill_similarity = 0.0
+        if skill >= 0:
+            # Max similarity to user's skills, weighted by level
+            for j in range(user_skill_idx.shape[0]):
+                weighted = similarity_matrix[skill, user_skill_idx[j]] * (0.5 + user_skill_levels[j] * 0.5)
+                if weighted > skill_relevance:
+                    skill_relevance = weighted
+            skill_relevance *= similarity_scale
+            
+            # Direct match = 1.0, otherwise max gap-weighted similarity
+            if is_improvement[skill]:
+                skill_similarity = 1.0
+            else:
+                for j in range(improve_skill_idx.shape[0]):
+                    weighted = similarity_matrix[skill, improve_skill_idx[j]] * (0.5 + improve_gaps[j] * 0.5)
+                    if weighted > skill_similarity:
+                        skill_similarity = weighted
+                skill_similarity *= similarity_scale
+        
+        ideal_difficulty = level_by_skill[slot] + difficulty_offset
+        difficulty_match = max(0.0, 1.0 - abs(difficulty[i] - ideal_difficulty) * 2)
+        
+        scores[i] = (
+            weights[0] * gap_by_skill[slot] +
+            weights[1] * skill_relevance +
+            weights[2] * difficulty_match +
+            weights[3] * resource_type[i] +
+            weights[4] * skill_similarity
+        )
+    
+    return scores
 
 
 class ResourceRanker:
@@ -87,9 +145,13 @@ class ResourceRanker:
                       skill_to_idx: Optional[Dict[str, int]] = None,
                       peer_data: Optional[List[Dict[str, Any]]] = None,
                       custom_weights: Optional[Dict[str, float]] = None,
-                      persona: Optional[str] = None) -> List[Dict[str, Any]]:
+                      persona: Optional[str] = None,
+                      similarity_scale: float = 1.0) -> List[Dict[str, Any]]:
         """
         Rank resources based on multiple scoring factors.
+        
+        similarity_scale converts similarity_matrix entries back to [0, 1];
+        pass the scale from quantize_similarity_matrix when the matrix is int8.
         """
         ranked_resources = []
         applied_weights, difficulty_offset = self._resolve_persona_settings(persona, custom_weights)
@@ -123,7 +185,7 @@ class ResourceRanker:
             )
             
             skill_relevance_score = self._calculate_skill_relevance_score(
-                skill_id, user_skill_levels, similarity_matrix, skill_to_idx
+                skill_id, user_skill_levels, similarity_matrix, skill_to_idx, similarity_scale
             )
             
             difficulty_match_score = self._calculate_difficulty_match_score(
@@ -136,7 +198,7 @@ class ResourceRanker:
             # Legacy scores (kept low/zero weight for now)
             resource_type_score = features.get('type', 0.7)
             skill_similarity_score = self._calculate_skill_similarity_score(
-                skill_id, skills_to_improve, similarity_matrix, skill_to_idx
+                skill_id, skills_to_improve, similarity_matrix, skill_to_idx, similarity_scale
             )
             
             # Calculate weighted total score
@@ -161,24 +223,145 @@ class ResourceRanker:
                     'skill_similarity': skill_similarity_score
                 }
             })
-            
-            ranked_resources.append({
-                'resource': resource,
-                'score': total_score,
-                'breakdown': {
-                    'skill_gap': skill_gap_score,
-                    'skill_relevance': skill_relevance_score,
-                    'difficulty_match': difficulty_match_score,
-                    'resource_type': resource_type_score,
-                    'skill_similarity': skill_similarity_score
-                }
-            })
+
         
         # Sort by score (descending)
         ranked_resources.sort(key=lambda x: x['score'], reverse=True)
         
         return ranked_resources
     
+    def rank_resource_arrays(self,
+                             resource_arrays: Dict[str, np.ndarray],
+                             similarity_matrix: np.ndarray,
+                             user_skill_idx: np.ndarray,
+                             user_skill_levels: np.ndarray,
+                             improve_skill_idx: np.ndarray,
+                             improve_gaps: np.ndarray,
+                             improve_levels: np.ndarray,
+                             similarity_scale: float = 1.0,
+                             top_k: Optional[int] = None,
+                             similar_skills_per_goal: Optional[int] = None,
+                             custom_weights: Optional[Dict[str, float]] = None,
+                             persona: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Compiled equivalent of rank_resources for Structure-of-Arrays input.
+        
+        Scores every resource with a Numba kernel over contiguous arrays
+        instead of a Python loop over resource dictionaries. Skills are
+        given as similarity-matrix indices (see
+        DataPreprocessor.build_resource_arrays and build_skill_index_arrays).
+        Collaborative scores are not supported on this path.
+        
+        Args:
+            resource_arrays: Dictionary with 'skill_idx' (-1 = unknown skill),
+                             'difficulty' and 'type' arrays, one entry per resource
+            similarity_matrix: Skill similarity matrix (may be int8-quantized)
+            user_skill_idx / user_skill_levels: User's skills and normalized levels
+            improve_skill_idx / improve_gaps / improve_levels: Skills to improve,
+                their gaps and normalized current levels
+            similarity_scale: Factor converting matrix entries to [0, 1]
+            top_k: Optional number of results to return
+            similar_skills_per_goal: If given, only score resources teaching a
+                skill to improve or one of its this many most similar skills.
+                All resources are scored when there are no skills to improve
+                or the candidates can't fill top_k.
+            custom_weights: Optional weights provided by admin
+            persona: Optional persona identifier
+        
+        Returns:
+            Tuple (indices, scores): row indices into resource_arrays, best
+            first, and their scores
+        """
+        applied_weights, difficulty_offset = self._resolve_persona_settings(persona, custom_weights)
+        
+        n_skills = similarity_matrix.shape[0]
+        
+        # Per-skill lookup tables with a trailing zero slot (index n_skills)
+        # that resources with an unknown skill read from
+        gap_by_skill = np.zeros(n_skills + 1)
+        gap_by_skill[improve_skill_idx] = np.minimum(improve_gaps, 1.0)
+        is_improvement = np.zeros(n_skills + 1, dtype=np.bool_)
+        is_improvement[improve_skill_idx] = True
+        # User's own level takes precedence over the IDP's current level
+        level_by_skill = np.zeros(n_skills + 1)
+        level_by_skill[improve_skill_idx] = improve_levels
+        level_by_skill[user_skill_idx] = user_skill_levels
+        
+        weights = np.array([
+            applied_weights['skill_gap'],
+            applied_weights['skill_relevance'],
+            applied_weights['difficulty_match'],
+            applied_weights.get('resource_type', 0.0),
+            applied_weights.get('skill_similarity', 0.0)
+        ])
+        
+        skill_idx = resource_arrays['skill_idx']
+        difficulty = resource_arrays['difficulty']
+        resource_type = resource_arrays['type']
+        
+        # Candidate selection: resources unrelated to every goal can't rank
+        # well, so only the relevant rows are scored
+        rows = None
+        if similar_skills_per_goal is not None and len(improve_skill_idx):
+            rows = self._candidate_rows(skill_idx, similarity_matrix, improve_skill_idx, similar_skills_per_goal)
+            if top_k is not None and len(rows) < top_k:
+                rows = None
+            else:
+                skill_idx, difficulty, resource_type = skill_idx[rows], difficulty[rows], resource_type[rows]
+        
+        total_scores = _score_resource_arrays(
+            similarity_matrix, similarity_scale,
+            skill_idx, difficulty, resource_type,
+            user_skill_idx, user_skill_levels, improve_skill_idx, improve_gaps,
+            gap_by_skill, is_improvement, level_by_skill, weights, difficulty_offset
+        )
+        
+        if top_k is not None and 0 < top_k < len(total_scores):
+            # Partial selection in O(R) instead of sorting every resource:
+            # find the top_k-th best score, take everything above it plus the
+            # first resources tied with it, then sort only those. Ties keep
+            # resource order, exactly like a full stable sort.
+            threshold = -np.partition(-total_scores, top_k - 1)[top_k - 1]
+            above = np.flatnonzero(total_scores > threshold)
+            tied = np.flatnonzero(total_scores == threshold)[:top_k - len(above)]
+            indices = np.concatenate((above, tied))
+            indices = indices[np.argsort(-total_scores[indices], kind='stable')]
+        else:
+            # Sort by score (descending); stable so ties keep resource order
+            indices = np.argsort(-total_scores, kind='stable')[:top_k]
+        
+        scores = total_scores[indices]
+        if rows is not None:
+            # Map candidate positions back to resource rows
+            indices = rows[indices]
+        return indices, scores
+    
+    def _candidate_rows(self, skill_idx: np.ndarray, similarity_matrix: np.ndarray,
+                        improve_skill_idx: np.ndarray, similar_skills_per_goal: int) -> np.ndarray:
+        """
+        Find the resources worth scoring for a set of skills to improve.
+        
+        Args:
+            skill_idx: Each resource's skill index (-1 = unknown skill)
+            similarity_matrix: Skill similarity matrix (may be int8-quantized)
+            improve_skill_idx: Indices of the skills to improve
+            similar_skills_per_goal: Number of most similar skills to include
+                                     for each skill to improve
+        
+        Returns:
+            Sorted row indices of resources teaching one of those skills
+        """
+        n_skills = similarity_matrix.shape[0]
+        # +1 because a skill is (usually) its own most similar skill
+        k = min(similar_skills_per_goal + 1, n_skills)
+        nearest = np.argpartition(similarity_matrix[improve_skill_idx], n_skills - k, axis=1)[:, n_skills - k:]
+        
+        # Trailing slot (index -1) is for resources with an unknown skill
+        is_candidate = np.zeros(n_skills + 1, dtype=np.bool_)
+        is_candidate[nearest.ravel()] = True
+        is_candidate[improve_skill_idx] = True
+        return np.flatnonzero(is_candidate[skill_idx])
+    
     def _build_user_skill_map(self, user_skills: List[Dict[str, Any]]) -> Dict[str, float]:
         """
         Build a map of user's skill IDs to normalized levels.
@@ -306,7 +489,8 @@ class ResourceRanker:
     def _calculate_skill_relevance_score(self, skill_id: str,
                                         user_skill_levels: Dict[str, float],
                                         similarity_matrix: Optional[np.ndarray],
-                                        skill_to_idx: Optional[Dict[str, int]]) -> float:
+                                        skill_to_idx: Optional[Dict[str, int]],
+                                        similarity_scale: float = 1.0) -> float:
         """
         Calculate how relevant this skill is to user's existing skills.
         Skills similar to what user already knows are more relevant.
@@ -316,11 +500,12 @@ class ResourceRanker:
             user_skill_levels: Map of user's skill IDs to levels
             similarity_matrix: Optional precomputed similarity matrix
             skill_to_idx: Optional mapping from skill ID to matrix index
+            similarity_scale: Factor converting matrix entries to [0, 1]
             
         Returns:
             Relevance score between 0.0 and 1.0
         """
-        if not similarity_matrix or not skill_to_idx:
+        if similarity_matrix is None or not skill_to_idx:
             # Fallback: simple check if user has similar skills
             return 0.5 if user_skill_levels else 0.0
         
@@ -339,7 +524,8 @@ class ResourceRanker:
                 weighted_similarity = similarity * (0.5 + user_level * 0.5)
                 max_similarity = max(max_similarity, weighted_similarity)
         
-        return max_similarity
+        # Apply the scale once instead of per lookup
+        return float(max_similarity * similarity_scale)
     
     def _calculate_difficulty_match_score(self, skill_id: str,
                                          resource_features: Dict[str, Any],
@@ -392,7 +578,8 @@ class ResourceRanker:
     def _calculate_skill_similarity_score(self, skill_id: str,
                                          skills_to_improve: List[Dict[str, Any]],
                                          similarity_matrix: Optional[np.ndarray],
-                                         skill_to_idx: Optional[Dict[str, int]]) -> float:
+                                         skill_to_idx: Optional[Dict[str, int]],
+                                         similarity_scale: float = 1.0) -> float:
         """
         Calculate score based on similarity to skills user wants to improve.
         
@@ -405,6 +592,7 @@ class ResourceRanker:
             skills_to_improve: List of skills user wants to improve (from IDP)
             similarity_matrix: Optional precomputed skill similarity matrix
             skill_to_idx: Optional mapping from skill ID to matrix index
+            similarity_scale: Factor converting matrix entries to [0, 1]
             
         Returns:
             Similarity score (0.0-1.0), where:
@@ -413,7 +601,7 @@ class ResourceRanker:
             - 0.0 = no similarity or missing data
         """
         # If we don't have similarity data, can't calculate this score
-        if not similarity_matrix or not skill_to_idx:
+        if similarity_matrix is None or not skill_to_idx:
             return 0.0
         
         # If skill not in our system, can't calculate
@@ -443,7 +631,8 @@ class ResourceRanker:
                 weighted_similarity = similarity * (0.5 + gap * 0.5)
                 max_similarity = max(max_similarity, weighted_similarity)
         
-        return max_similarity
+        # Apply the scale once instead of per lookup
+        return float(max_similarity * similarity_scale)
 
     def _calculate_collaborative_scores(self, 
                                       user_skill_ids: set, 
@@ -6,7 +6,7 @@ Replaces the old keyword/category based approach with semantic similarity.
 """
 
 import numpy as np
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple
 from core.embeddings import generate_embeddings
 from core.vector_store import VectorStore
 
@@ -72,6 +72,24 @@ class SkillSimilarityCalculator:
         
         return similarity_matrix
     
+    def quantize_similarity_matrix(self, similarity_matrix: np.ndarray) -> Tuple[np.ndarray, float]:
+        """
+        Quantize a similarity matrix to int8 with a single scale factor.
+        
+        Similarities are clipped to [0, 1] and ranking only depends on their
+        ordering, so 8 bits per entry is plenty and the matrix takes a quarter
+        of the memory (and memory bandwidth) of float32.
+        
+        Args:
+            similarity_matrix: Similarity matrix with values in [0, 1]
+            
+        Returns:
+            Tuple (int8 matrix, scale) where original ~= quantized * scale
+        """
+        scale = 1.0 / 127.0
+        quantized = np.round(np.asarray(similarity_matrix) * 127).astype(np.int8)
+        return quantized, scale
+    
     def get_similar_skills(self, skill_id: str, similarity_matrix: np.ndarray,
                           skill_to_idx: Dict[str, int], top_k: int = 5) -> List[Dict[str, Any]]:
         """
@@ -14,8 +14,10 @@ Endpoints:
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from routers import recommend
 import os
+import sys
 from dotenv import load_dotenv
 
 # Load environment variables from .env file if it exists
@@ -29,7 +31,8 @@ app = FastAPI(
     description="AI-powered recommendation system for learning resources",
     version="1.0.0",
     docs_url="/docs",  # Swagger UI documentation
-    redoc_url="/redoc"  # ReDoc documentation
+    redoc_url="/redoc",  # ReDoc documentation
+    default_response_class=ORJSONResponse  # Faster serialization than stdlib json
 )
 
 # Configure CORS (Cross-Origin Resource Sharing)
@@ -53,9 +56,9 @@ async def root():
     Root endpoint - provides basic information about the service.
     
     Returns:
-        Dictionary with service information
+        JSON response with service information
     """
-    return {
+    return ORJSONResponse(content={
         "service": "Optima IDP Recommendation Service",
         "version": "1.0.0",
         "status": "running",
@@ -65,7 +68,7 @@ async def root():
             "health": "/recommend/health",
             "docs": "/docs"
         }
-    }
+    })
 
 
 @app.on_event("startup")
@@ -108,19 +111,31 @@ async def shutdown_event():
 
 # Run the application
 if __name__ == "__main__":
+    import multiprocessing
     import uvicorn
     
     # Get port from environment variable or use default
     port = int(os.getenv("RECOMMENDER_PORT", 8000))
     host = os.getenv("HOST", "0.0.0.0")
     
+    # ENV=dev enables auto-reload, which only supports a single process.
+    # Otherwise run WEB_CONCURRENCY worker processes (default 2 * cores + 1)
+    # so recommendation requests use every CPU core.
+    dev = os.getenv("ENV") == "dev"
+    workers = None if dev else int(
+        os.getenv("WEB_CONCURRENCY", 2 * multiprocessing.cpu_count() + 1)
+    )
+    
     # Start the server
-    # reload=True enables auto-reload during development
+    # uvloop and httptools replace the default asyncio loop and HTTP parser
+    # (uvloop isn't available on Windows, so fall back to asyncio there)
     uvicorn.run(
         "main:app",
         host=host,
         port=port,
-        reload=True,
+        reload=dev,
+        workers=workers,
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
         log_level="info"
     )
-
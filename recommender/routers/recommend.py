@@ -9,6 +9,7 @@ Provides endpoints for:
 """
 
 from fastapi import APIRouter, HTTPException, Body
+from fastapi.responses import ORJSONResponse
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
 import sys
@@ -69,7 +70,7 @@ async def get_resource_recommendations(request: RecommendationRequest):
         request: RecommendationRequest containing user data and resources
         
     Returns:
-        Dictionary with:
+        JSON response with:
         - recommendations: List of ranked resources with scores
         - skills_to_improve: Extracted skills that need improvement
         - total_count: Total number of recommendations
@@ -171,12 +172,14 @@ async def get_resource_recommendations(request: RecommendationRequest):
                 'provider': resource.get('provider', 'Unknown')
             })
         
-        return {
+        # Return the response directly to skip re-validation and
+        # jsonable_encoder on this (potentially large) payload
+        return ORJSONResponse(content={
             'recommendations': formatted_recommendations,
             'skills_to_improve': skills_to_improve,
             'total_count': len(ranked_resources),
             'returned_count': len(formatted_recommendations)
-        }
+        })
         
     except Exception as e:
         # Log error and return appropriate HTTP error
@@ -201,7 +204,7 @@ async def get_similar_skills(request: SimilarSkillsRequest):
         request: SimilarSkillsRequest with target skill and system skills
         
     Returns:
-        Dictionary with:
+        JSON response with:
         - similar_skills: List of similar skills with similarity scores
         - target_skill: Information about the target skill
     """
@@ -255,11 +258,11 @@ async def get_similar_skills(request: SimilarSkillsRequest):
                     })
                     break
         
-        return {
+        return ORJSONResponse(content={
             'target_skill': target_skill,
             'similar_skills': formatted_similar,
             'count': len(formatted_similar)
-        }
+        })
         
     except HTTPException:
         raise
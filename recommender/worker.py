@@ -1,15 +1,26 @@
 import os
-import json
+import sys
 import time
-import datetime
-import redis
-from pymongo import MongoClient
+import asyncio
+import logging
+import logging.handlers
+import queue
+from concurrent.futures.process import BrokenProcessPool
+import hashlib
+import socket
+import base64
+import msgpack
+import orjson
+import numpy as np
+from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 from bson.objectid import ObjectId
 
 from core.preprocessing import DataPreprocessor
 from core.skill_similarity import SkillSimilarityCalculator
-from core.resource_ranker import ResourceRanker
+from core.ranker_pool import create_ranker_pool, rank, share_arrays
 
 # Load env vars
 # Load env vars
@@ -17,124 +28,728 @@ dotenv_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
 load_dotenv(dotenv_path)
 
 # Configuration
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()  # WARNING drops all per-job logs
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/optima_idp")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
 QUEUE_NAME = "recommendation_queue"
+PROCESSING_QUEUE = f"{QUEUE_NAME}:processing"  # Backup queue for in-flight jobs
+DEAD_LETTER_QUEUE = f"{QUEUE_NAME}:dead"  # Jobs that failed MAX_JOB_ATTEMPTS times
+JOB_STARTED_KEY = f"{QUEUE_NAME}:started"  # Hash: running job -> start time (Redis clock)
+JOB_OWNER_KEY = f"{QUEUE_NAME}:owner"  # Hash: in-flight job -> WORKER_ID that dequeued it
+MAX_JOB_ATTEMPTS = int(os.getenv("WORKER_MAX_ATTEMPTS", 3))
+JOB_TIMEOUT_SECONDS = int(os.getenv("WORKER_JOB_TIMEOUT", 300))  # In flight longer = worker died/hung
+JANITOR_INTERVAL_SECONDS = 60
+# Pause after a batch with failures, doubling while they continue, so a
+# short outage doesn't burn through every queued job's attempts
+FAILURE_BACKOFF_SECONDS = 1
+MAX_FAILURE_BACKOFF_SECONDS = 30
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+WORKER_HEARTBEAT_PREFIX = "recommender:worker"  # <prefix>:<WORKER_ID> exists while the worker lives
+WORKER_HEARTBEAT_TTL_SECONDS = 3 * JANITOR_INTERVAL_SECONDS
+COMPLETED_COUNTER = "recommender:completed"  # Total jobs completed by all workers
+BATCH_SIZE = int(os.getenv("WORKER_BATCH_SIZE", 8))
+TOP_RECOMMENDATIONS = 10  # Recommendations saved per IDP
+# Only resources for a goal skill or one of its N most similar skills are ranked
+SIMILAR_SKILLS_PER_GOAL = int(os.getenv("SIMILAR_SKILLS_PER_GOAL", 5))
+RANKER_PROCESSES = int(os.getenv("RANKER_PROCESSES", os.cpu_count() or 1))
 
-# Initialize Services
-redis_client = redis.from_url(REDIS_URL)
-mongo_client = MongoClient(MONGO_URI)
+# Skills/resources change rarely, so each worker keeps them in-process for a
+# short TTL. The API publishes the collection name on CACHE_INVALIDATE_CHANNEL
+# whenever it writes to it, which drops our copy before the TTL expires.
+CACHE_TTL_SECONDS = int(os.getenv("RECOMMENDER_CACHE_TTL", 60))
+CACHE_INVALIDATE_CHANNEL = "cache:invalidate"
+
+# Only the fields the recommendation pipeline reads (smaller BSON to decode)
+SKILL_PROJECTION = {"name": 1, "description": 1, "updatedAt": 1}
+USER_PROJECTION = {"skills": 1, "_id": 0}
+IDP_PROJECTION = {"goals": 1, "_id": 0}
+RESOURCE_PROJECTION = {
+    "title": 1, "type": 1, "difficulty": 1, "provider": 1, "updatedAt": 1,
+    "skill._id": 1, "skill.name": 1
+}
+
+# Resources are decoded from the cursor this many documents at a time
+RESOURCE_CURSOR_BATCH_SIZE = 500
+
+# Populate each resource's skill reference server-side (PyMongo doesn't have
+# populate like Mongoose). Resources whose skill no longer exists are kept,
+# just without a skill. $project goes last so only needed fields are sent.
+RESOURCE_PIPELINE = [
+    {"$lookup": {"from": "skills", "localField": "skill", "foreignField": "_id", "as": "skill"}},
+    {"$unwind": {"path": "$skill", "preserveNullAndEmptyArrays": True}},
+    {"$project": RESOURCE_PROJECTION}
+]
+
+# The skill similarity matrix only changes when a skill does, so it is built
+# once per skill-set version and shared between workers through Redis.
+SIMILARITY_CACHE_PREFIX = "simmat:int8"
+SIMILARITY_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+# Same idea for the ranker's resource features, keyed by resource-set version
+RESOURCE_FEATURES_CACHE_PREFIX = "recommender:res_features"
+RESOURCE_FEATURES_CACHE_TTL_SECONDS = 24 * 60 * 60
+
+logger = logging.getLogger("recommender.worker")
+logger.addHandler(logging.NullHandler())  # Silent unless configure_logging() is called
+
+# Initialize Services (async clients, so independent I/O can overlap)
+# Keepalive and health checks stop idle connections (low traffic) from being
+# dropped silently and paying a reconnect on the next job
+redis_client = aioredis.from_url(
+    REDIS_URL,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    socket_keepalive=True,
+    health_check_interval=30,
+    decode_responses=False
+)
+mongo_client = AsyncIOMotorClient(MONGO_URI)
 db = mongo_client.get_database() # Uses database from URI
 
 preprocessor = DataPreprocessor()
 similarity_calculator = SkillSimilarityCalculator()
-resource_ranker = ResourceRanker()
 
-def process_job(job_data):
+# Atomically moves up to ARGV[1] jobs from the main queue (KEYS[1]) to the
+# processing queue (KEYS[2]) in a single round-trip, recording this worker
+# (ARGV[2]) as their owner in the KEYS[3] hash.
+DEQUEUE_BATCH_SCRIPT = """
+local jobs = {}
+for i = 1, tonumber(ARGV[1]) do
+    local job = redis.call('RPOPLPUSH', KEYS[1], KEYS[2])
+    if not job then break end
+    redis.call('HSET', KEYS[3], job, ARGV[2])
+    table.insert(jobs, job)
+end
+return jobs
+"""
+dequeue_batch = redis_client.register_script(DEQUEUE_BATCH_SCRIPT)
+
+# Records that job ARGV[1] starts running now (Redis clock) in the KEYS[1] hash
+START_JOB_SCRIPT = """
+redis.call('HSET', KEYS[1], ARGV[1], redis.call('TIME')[1])
+"""
+start_job = redis_client.register_script(START_JOB_SCRIPT)
+
+# Atomically takes job ARGV[1] out of the processing queue (KEYS[1]) and its
+# start time and owner out of KEYS[3] and KEYS[4], then pushes ARGV[2] (the
+# job with updated attempts) onto KEYS[2]. Returns 0 without pushing if the
+# job was no longer in flight, so a job is never requeued twice.
+RETRY_JOB_SCRIPT = """
+redis.call('HDEL', KEYS[3], ARGV[1])
+redis.call('HDEL', KEYS[4], ARGV[1])
+if redis.call('LREM', KEYS[1], 1, ARGV[1]) == 0 then return 0 end
+redis.call('LPUSH', KEYS[2], ARGV[2])
+return 1
+"""
+retry_job_script = redis_client.register_script(RETRY_JOB_SCRIPT)
+
+# Jobs this worker has dequeued and not yet released (see requeue_stale_jobs)
+_held_jobs = set()
+
+# collection -> (loaded_at, documents)
+_cache = {"skills": (0.0, None), "resources": (0.0, None)}
+invalidation_listener = redis_client.pubsub(ignore_subscribe_messages=True)
+
+# Mapping and scale for the current skill-set version. "skills" holds the
+# list they were computed from, so jobs served from the same cached list
+# skip hashing.
+_similarity_cache = {"skills": None, "key": None, "skill_to_idx": None, "scale": None}
+
+# Resource ObjectIds (row order of the shared arrays) for the current
+# resource-set version. "resources" holds the list they were computed from, so jobs
+# served from the same cached list skip hashing.
+_resource_cache = {"resources": None, "skills_key": None, "version": None, "resource_ids": None}
+
+# Shared memory blocks handed to the ranker processes:
+# "similarity" / "resources" -> (version, SharedMemory, descriptor)
+_shared = {}
+
+# CPU-bound ranking runs here; a batch's jobs rank in parallel across cores.
+# Created by start_worker, not at import: the pool's forkserver imports this
+# module too, and must not build a pool of its own.
+ranker_pool = None
+
+
+async def _apply_invalidations():
+    """
+    Drain pending messages from the invalidation channel and drop the
+    matching cache entries. Resources embed their skill document, so a
+    skills change invalidates both.
+
+    Only start_worker's loop calls this (once per batch): the PubSub
+    connection can't be read by two coroutines at once.
+    """
+    try:
+        message = await invalidation_listener.get_message()
+        while message:
+            collection = message['data'].decode('utf-8')
+            if collection == "skills":
+                _cache["skills"] = (0.0, None)
+                _cache["resources"] = (0.0, None)
+            elif collection in _cache:
+                _cache[collection] = (0.0, None)
+            message = await invalidation_listener.get_message()
+    except Exception:
+        # Missed messages can't be recovered, so fall back to a full reload
+        for collection in _cache:
+            _cache[collection] = (0.0, None)
+
+
+def _get_cached(collection):
+    """Return cached documents for a collection, or None if stale/missing."""
+    loaded_at, docs = _cache[collection]
+    if docs is not None and time.time() - loaded_at < CACHE_TTL_SECONDS:
+        return docs
+    return None
+
+
+async def get_skills():
+    """
+    Get all skills, served from the in-process cache while it is fresh.
+    """
+    skills = _get_cached("skills")
+    if skills is None:
+        skills = await db.skills.find({}, SKILL_PROJECTION).to_list(None)
+        _cache["skills"] = (time.time(), skills)
+    return skills
+
+
+async def get_resources():
+    """
+    Get all resources with their skill reference populated, served from the
+    in-process cache while it is fresh. The join runs in MongoDB ($lookup).
+    """
+    resources = _get_cached("resources")
+    if resources is None:
+        cursor = db.resources.aggregate(RESOURCE_PIPELINE, batchSize=RESOURCE_CURSOR_BATCH_SIZE)
+        resources = [resource async for resource in cursor]
+        _cache["resources"] = (time.time(), resources)
+    return resources
+
+
+def _version_key(documents):
+    """
+    Hash document IDs and their last update times into a version key.
+    Any added, removed or edited document produces a new key.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for token in sorted(f"{doc['_id']}:{doc.get('updatedAt')}" for doc in documents):
+        digest.update(token.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _share(kind, version, arrays):
+    """
+    Put arrays for a new data version in shared memory for the ranker
+    processes, releasing the block of the previous version.
+    """
+    shm, descriptor = share_arrays(arrays)
+    previous = _shared.get(kind)
+    _shared[kind] = (version, shm, descriptor)
+    if previous:
+        previous[1].close()
+        previous[1].unlink()
+    return descriptor
+
+
+def release_shared_data():
+    """Free all shared memory blocks (on shutdown)."""
+    for _, shm, _ in _shared.values():
+        shm.close()
+        shm.unlink()
+    _shared.clear()
+
+
+async def get_similarity_data(skills):
+    """
+    Get the skill index mapping and quantized similarity matrix for a skill set.
+
+    Lookup order: in-process cache, then Redis (raw int8 buffer plus a
+    msgpack'd mapping and scale), and only on a miss in both is the matrix
+    rebuilt from embeddings and published for the other workers. The matrix
+    itself goes to shared memory for the ranker processes.
+
+    Returns:
+        Tuple (version key, skill_to_idx, similarity_scale, shared-memory descriptor)
+    """
+    if _similarity_cache["skills"] is skills:
+        return _similarity_cache["key"], _similarity_cache["skill_to_idx"], _similarity_cache["scale"], _shared["similarity"][2]
+
+    key = _version_key(skills)
+    if _similarity_cache["key"] == key:
+        _similarity_cache["skills"] = skills
+        return key, _similarity_cache["skill_to_idx"], _similarity_cache["scale"], _shared["similarity"][2]
+
+    matrix_key = f"{SIMILARITY_CACHE_PREFIX}:{key}"
+    meta_key = f"{matrix_key}:meta"
+    matrix_bytes, meta_bytes = await redis_client.mget(matrix_key, meta_key)
+
+    if matrix_bytes and meta_bytes:
+        meta = msgpack.unpackb(meta_bytes)
+        skill_to_idx = meta["skill_to_idx"]
+        similarity_scale = meta["scale"]
+        n_skills = len(skill_to_idx)
+        similarity_matrix = np.frombuffer(matrix_bytes, dtype=np.int8).reshape(n_skills, n_skills)
+    else:
+        skill_to_idx = preprocessor.create_skill_mapping(skills)
+        n_skills = len(skill_to_idx)
+        # Embedding the skills takes a while, so keep the event loop free
+        raw_matrix = await asyncio.to_thread(similarity_calculator.build_similarity_matrix, skills)
+        similarity_matrix, similarity_scale = similarity_calculator.quantize_similarity_matrix(raw_matrix)
+        similarity_matrix = similarity_matrix.reshape(n_skills, n_skills)
+
+        meta = {"skill_to_idx": skill_to_idx, "scale": similarity_scale}
+        pipe = redis_client.pipeline()
+        pipe.set(matrix_key, similarity_matrix.tobytes(), ex=SIMILARITY_CACHE_TTL_SECONDS)
+        pipe.set(meta_key, msgpack.packb(meta), ex=SIMILARITY_CACHE_TTL_SECONDS)
+        await pipe.execute()
+
+    descriptor = _share("similarity", key, {"similarity": similarity_matrix})
+    _similarity_cache.update(skills=skills, key=key, skill_to_idx=skill_to_idx, scale=similarity_scale)
+    return key, skill_to_idx, similarity_scale, descriptor
+
+
+async def get_resource_data(resources, skills_key, skill_to_idx):
+    """
+    Get the resource IDs and shared-memory feature arrays for a resource set.
+
+    Features are cached per resource-set version in Redis (msgpack'd,
+    shared by all workers) and only recomputed on a miss. They are then laid out
+    as arrays (one per feature) in shared memory for the ranker processes.
+    The arrays reference skill-matrix indices, so they also depend on the
+    skill-set version.
+
+    Returns:
+        Tuple (resource ObjectIds, shared-memory descriptor)
+    """
+    if _resource_cache["resources"] is resources and _resource_cache["skills_key"] == skills_key:
+        return _resource_cache["resource_ids"], _shared["resources"][2]
+
+    version = (_version_key(resources), skills_key)
+    if _resource_cache["version"] != version:
+        features_key = f"{RESOURCE_FEATURES_CACHE_PREFIX}:v{version[0]}"
+        cached = await redis_client.get(features_key)
+        features = None
+        if cached:
+            try:
+                features = msgpack.unpackb(cached)
+            except ValueError:
+                # Not msgpack (e.g. written by an older worker), recompute
+                pass
+        if features is None:
+            features = preprocessor.prepare_resource_features(resources)
+            await redis_client.set(features_key, msgpack.packb(features), ex=RESOURCE_FEATURES_CACHE_TTL_SECONDS)
+
+        resource_ids, arrays = preprocessor.build_resource_arrays(features, skill_to_idx)
+        _share("resources", version, arrays)
+        # Parsed once per version rather than for every recommendation
+        _resource_cache.update(version=version, resource_ids=[ObjectId(r) for r in resource_ids])
+
+    _resource_cache.update(resources=resources, skills_key=skills_key)
+    return _resource_cache["resource_ids"], _shared["resources"][2]
+
+
+def decode_object_id(encoded, hex_id):
+    """
+    Build an ObjectId from the base64 of its 12 raw bytes, as sent by the
+    API, skipping the hex parse. Falls back to the 24-character hex id for
+    jobs queued without the encoded form.
+    """
+    if encoded:
+        raw = base64.b64decode(encoded)
+        if len(raw) == 12:
+            return ObjectId(raw)
+    return ObjectId(hex_id)
+
+
+def _replace_ranker_pool(broken_pool):
+    """
+    Swap in a fresh ranker pool after a pool process died (e.g. crashed in
+    native code): a broken ProcessPoolExecutor fails every later task.
+    Concurrent jobs that hit the same broken pool only replace it once.
+    """
+    global ranker_pool
+    if ranker_pool is broken_pool:
+        ranker_pool = create_ranker_pool(RANKER_PROCESSES)
+        broken_pool.shutdown(wait=False)
+
+
+async def load_ranking_data():
+    """
+    Load what every job ranks against: skills and resources (cached) and
+    their mapping/shared-memory arrays.
+
+    Called once per batch, so all jobs in a batch share one data version
+    and no shared block is released while one of them still ranks against it.
+
+    Returns:
+        Dictionary with skill_mapping, similarity_scale, similarity and
+        resources (shared-memory descriptors) and resource_ids
+    """
+    all_skills, all_resources = await asyncio.gather(get_skills(), get_resources())
+    
+    # Skill Mapping, Similarity Matrix and Resource Features are cached per
+    # skill/resource-set version and live in shared memory
+    skills_key, skill_mapping, similarity_scale, similarity_block = await get_similarity_data(all_skills)
+    resource_ids, resource_block = await get_resource_data(all_resources, skills_key, skill_mapping)
+    
+    return {
+        'skill_mapping': skill_mapping,
+        'similarity_scale': similarity_scale,
+        'similarity': similarity_block,
+        'resources': resource_block,
+        'resource_ids': resource_ids
+    }
+
+
+async def process_job(job_data, ranking_data):
     """
     Process a recommendation job.
-    1. Fetch data from MongoDB (User, IDP, Skills, Resources)
-    2. Generate recommendations
+    1. Fetch the User and IDP from MongoDB concurrently
+    2. Generate recommendations against ranking_data (see load_ranking_data)
     3. Update IDP in MongoDB
+
+    Errors propagate to the caller, which retries or dead-letters the job.
     """
-    try:
-        user_id = job_data.get('userId')
-        idp_id = job_data.get('idpId')
-        
-        print(f"Processing job for User: {user_id}, IDP: {idp_id}")
-        
-        # 1. Fetch Data
-        user = db.users.find_one({"_id": ObjectId(user_id)})
-        idp = db.idps.find_one({"_id": ObjectId(idp_id)})
-        all_skills = list(db.skills.find({}))
-        # Fetch resources (PyMongo doesn't have populate like Mongoose)
-        # Resources should have skill reference stored as ObjectId or embedded object
-        all_resources = list(db.resources.find({}))
+    user_id = job_data.get('userId')
+    idp_id = job_data.get('idpId')
+    user_oid = decode_object_id(job_data.get('userOid'), user_id)
+    idp_oid = decode_object_id(job_data.get('idpOid'), idp_id)
+    
+    logger.debug("Processing job for User: %s, IDP: %s", user_id, idp_id)
+    
+    # 1. Fetch Data (total wait is the slowest query, not the sum)
+    user, idp = await asyncio.gather(
+        # Point lookups on the default _id index
+        db.users.find_one({"_id": user_oid}, USER_PROJECTION),
+        db.idps.find_one({"_id": idp_oid}, IDP_PROJECTION)
+    )
+    
+    if user is None or idp is None:
+        logger.warning("User or IDP not found (User: %s, IDP: %s)", user_id, idp_id)
+        return
+
+    # 2. Prepare Inputs
+    user_skills = user.get('skills', [])
+    
+    # Extract goals from IDP (default gap/levels until they are calculated)
+    skills_to_improve = [
+        {'skillId': str(goal.get('skill')), 'gap': 0.5, 'currentLevel': 1, 'targetLevel': 5}
+        for goal in idp.get('goals', ())
+    ]
         
-        # Enrich resources with skill data if needed
-        # If resources only have skill IDs, we can populate them manually
-        skill_map = {str(skill['_id']): skill for skill in all_skills}
-        for resource in all_resources:
-            skill_ref = resource.get('skill')
-            if skill_ref and isinstance(skill_ref, ObjectId):
-                # If skill is just an ObjectId, replace with full skill object
-                skill_id_str = str(skill_ref)
-                if skill_id_str in skill_map:
-                    resource['skill'] = skill_map[skill_id_str]
+    # 3. Rank Resources in the process pool (only candidates related to the
+    #    goals are scored and only the top results are kept, no full sort).
+    #    Only per-user inputs cross the process boundary.
+    payload = {
+        'similarity': ranking_data['similarity'],
+        'similarity_scale': ranking_data['similarity_scale'],
+        'resources': ranking_data['resources'],
+        'skill_inputs': preprocessor.build_skill_index_arrays(
+            user_skills, skills_to_improve, ranking_data['skill_mapping']
+        ),
+        'top_k': TOP_RECOMMENDATIONS,
+        'similar_skills_per_goal': SIMILAR_SKILLS_PER_GOAL
+    }
+    pool = ranker_pool
+    try:
+        indices, scores = await asyncio.get_running_loop().run_in_executor(pool, rank, payload)
+    except BrokenProcessPool:
+        # The job itself is retried like any other failure
+        _replace_ranker_pool(pool)
+        raise
+    resource_ids = ranking_data['resource_ids']
+    
+    # 4. Format and Update IDP
+    formatted_recs = [
+        {
+            'resource': resource_ids[idx], # Reference to Resource
+            'score': score,
+            'reason': 'Recommended based on your goals'
+        }
+        for idx, score in zip(indices, scores)
+    ]
         
-        if not user or not idp:
-            print("User or IDP not found")
-            return
+    # Update IDP status and recommendations
+    await db.idps.update_one(
+        {"_id": idp_oid},
+        {
+            "$set": {
+                "suggestedResources": formatted_recs,
+                "status": "active" # Or whatever status indicates ready
+            },
+            # Stamped by the server (no client clock, nothing to encode)
+            "$currentDate": {"updatedAt": True}
+        }
+    )
+    
+    logger.info("Job completed for IDP: %s", idp_id)
+    
 
-        # 2. Prepare Inputs
-        user_skills = user.get('skills', [])
-        skills_to_improve = []
-        
-        # Extract goals from IDP
-        for goal in idp.get('goals', []):
-            skills_to_improve.append({
-                'skillId': str(goal.get('skill')),
-                'gap': 0.5, # Default gap if not calculated
-                'currentLevel': 1,
-                'targetLevel': 5
-            })
+def configure_logging():
+    """
+    Send worker logs to stdout through a queue.
+
+    The event loop only enqueues records; formatting and the actual write
+    happen on the QueueListener's thread. Returns the started listener,
+    which should be stopped on shutdown to flush pending records.
+    """
+    log_queue = queue.SimpleQueue()
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+
+    listener = logging.handlers.QueueListener(log_queue, console_handler)
+    listener.start()
+    return listener
+
+
+async def fetch_batch():
+    """
+    Move the next batch of jobs into the processing queue and return them.
+
+    Grabs up to BATCH_SIZE jobs with one script call. If the queue is
+    empty, blocks on BRPOPLPUSH until a single job arrives instead.
+    """
+    jobs = await dequeue_batch(keys=[QUEUE_NAME, PROCESSING_QUEUE, JOB_OWNER_KEY], args=[BATCH_SIZE, WORKER_ID])
+    if jobs:
+        _held_jobs.update(jobs)
+        return jobs
+
+    # timeout=0 means block indefinitely until a job arrives
+    job = await redis_client.brpoplpush(QUEUE_NAME, PROCESSING_QUEUE, timeout=0)
+    if not job:
+        return []
+    _held_jobs.add(job)
+    await redis_client.hset(JOB_OWNER_KEY, job, WORKER_ID)
+    return [job]
+
+
+async def retry_job(job_json_bytes, reason, count_attempt=True):
+    """
+    Move a failed job from the processing queue back onto the main queue,
+    or onto the dead-letter queue once it has used MAX_JOB_ATTEMPTS.
+
+    The attempt count and last error travel inside the job itself. Jobs
+    that can't be rewritten (not valid JSON, not an object, a broken
+    attempts count) go straight to the dead-letter queue. With
+    count_attempt=False (the job never ran) it is requeued unchanged.
+
+    Returns:
+        The queue the job was moved to, or None if it was no longer in
+        the processing queue (another worker already handled it)
+    """
+    if not count_attempt:
+        target, retried_json = QUEUE_NAME, job_json_bytes
+    else:
+        try:
+            job = orjson.loads(job_json_bytes)
+            job['attempts'] = int(job.get('attempts', 0)) + 1
+            job['lastError'] = reason
+            target = QUEUE_NAME if job['attempts'] < MAX_JOB_ATTEMPTS else DEAD_LETTER_QUEUE
+            retried_json = orjson.dumps(job)
+        except (ValueError, TypeError, AttributeError):
+            target, retried_json = DEAD_LETTER_QUEUE, job_json_bytes
+
+    moved = await retry_job_script(
+        keys=[PROCESSING_QUEUE, target, JOB_STARTED_KEY, JOB_OWNER_KEY],
+        args=[job_json_bytes, retried_json]
+    )
+    return target if moved else None
+
+
+async def requeue_stale_jobs():
+    """
+    Janitor: keeps this worker's heartbeat alive and, every
+    JANITOR_INTERVAL_SECONDS, recovers jobs stuck in the processing queue.
+
+    - A job that has been running for more than JOB_TIMEOUT_SECONDS (its
+      worker crashed or hung mid-job) is retried as a failed attempt, so a
+      job that keeps killing workers ends up in the dead-letter queue.
+    - A job that hasn't started yet (prefetched, waiting its turn) is left
+      alone while its owner's heartbeat is alive and the owner still holds
+      it. Once the owner is gone, or this worker released it without
+      finishing it (e.g. Redis was down when it tried to requeue it), it
+      goes back onto the main queue without using an attempt.
+    """
+    heartbeat_key = f"{WORKER_HEARTBEAT_PREFIX}:{WORKER_ID}"
+    worker_id = WORKER_ID.encode('utf-8')
+    unclaimed = set()  # Unstarted jobs nobody held at the last pass
+    while True:
+        try:
+            await redis_client.set(heartbeat_key, 1, ex=WORKER_HEARTBEAT_TTL_SECONDS)
+            now, _ = await redis_client.time()
+            # Read the hashes first: a job dequeued in between then just
+            # looks unowned for one pass instead of losing its entries
+            started = await redis_client.hgetall(JOB_STARTED_KEY)
+            owners = await redis_client.hgetall(JOB_OWNER_KEY)
+            in_flight = await redis_client.lrange(PROCESSING_QUEUE, 0, -1)
             
-        # 3. Run Recommendation Pipeline
-        # a. Skill Mapping
-        skill_mapping = preprocessor.create_skill_mapping(all_skills)
-        
-        # b. Similarity Matrix (using Embeddings now)
-        similarity_matrix = similarity_calculator.build_similarity_matrix(all_skills)
-        
-        # c. Resource Features
-        resource_features = preprocessor.prepare_resource_features(all_resources)
+            owner_ids = list(set(owners.values()))
+            heartbeats = await redis_client.mget(
+                [f"{WORKER_HEARTBEAT_PREFIX}:{owner.decode('utf-8')}" for owner in owner_ids]
+            ) if owner_ids else []
+            live_owners = {owner for owner, beat in zip(owner_ids, heartbeats) if beat}
+            
+            previously_unclaimed, unclaimed = unclaimed, set()
+            for job_json_bytes in in_flight:
+                started_at = started.pop(job_json_bytes, None)
+                owner = owners.pop(job_json_bytes, None)
+                if started_at is not None:
+                    if now - float(started_at) > JOB_TIMEOUT_SECONDS:
+                        target = await retry_job(job_json_bytes, "Timed out in processing queue")
+                        if target:
+                            logger.warning("🧹 Stale job moved to %s", target)
+                elif owner is None or (owner == worker_id and job_json_bytes not in _held_jobs):
+                    # Owners and _held_jobs are recorded right after the
+                    # dequeue, so only requeue if still unclaimed next pass
+                    if job_json_bytes in previously_unclaimed:
+                        if await retry_job(job_json_bytes, "Released before starting", count_attempt=False):
+                            logger.warning("🧹 Unclaimed job requeued")
+                    else:
+                        unclaimed.add(job_json_bytes)
+                elif owner not in live_owners:
+                    if await retry_job(job_json_bytes, "Worker died before starting it", count_attempt=False):
+                        logger.warning("🧹 Orphaned job requeued")
+            
+            # Whatever is left belongs to jobs no longer in flight
+            if started or owners:
+                pipe = redis_client.pipeline(transaction=False)
+                if started:
+                    pipe.hdel(JOB_STARTED_KEY, *started)
+                if owners:
+                    pipe.hdel(JOB_OWNER_KEY, *owners)
+                await pipe.execute()
+        except Exception as e:
+            # Keep going: the heartbeat stops if this task ends, and other
+            # workers would then requeue this worker's prefetched jobs
+            logger.warning("⚠️  Janitor Error: %s", e)
+        await asyncio.sleep(JANITOR_INTERVAL_SECONDS)
+
+
+async def run_job(job_json_bytes, ranking_data):
+    """
+    Run one dequeued job. Failed jobs are retried or dead-lettered here.
+
+    Args:
+        job_json_bytes: The job exactly as stored in the processing queue
+        ranking_data: The batch's load_ranking_data() result
+
+    Returns:
+        True if the job completed and should be removed from the
+        processing queue
+    """
+    try:
+        job = orjson.loads(job_json_bytes)
         
-        # d. Rank Resources
-        ranked_resources = resource_ranker.rank_resources(
-            resources=all_resources,
-            user_skills=user_skills,
-            skills_to_improve=skills_to_improve,
-            resource_features=resource_features,
-            similarity_matrix=similarity_matrix,
-            skill_to_idx=skill_mapping
-        )
+        # Log job details
+        user_id = job.get('data', {}).get('userId', 'unknown')
+        idp_id = job.get('data', {}).get('idpId', 'unknown')
+        logger.info("✅ Job received - User: %s, IDP: %s", user_id, idp_id)
         
-        # 4. Format and Update IDP
-        top_recommendations = ranked_resources[:10]
-        formatted_recs = []
+        # ============================================================
+        # STEP 2: DO THE WORK
+        # ============================================================
+        # The job is now safely in the processing queue.
+        # Even if we crash here, we won't lose the job.
+        # The janitor's timeout runs from here: waiting behind other jobs
+        # or for the ranking data to load doesn't make a job stale
+        await start_job(keys=[JOB_STARTED_KEY], args=[job_json_bytes])
+        start_time = time.time()
+        await process_job(job.get('data'), ranking_data)
+        elapsed = time.time() - start_time
         
-        for item in top_recommendations:
-            res = item['resource']
-            formatted_recs.append({
-                'resource': res['_id'], # Reference to Resource
-                'score': item['score'],
-                'reason': item['breakdown'].get('reason', 'Recommended based on your goals')
-            })
-            
-        # Update IDP status and recommendations
-        db.idps.update_one(
-            {"_id": ObjectId(idp_id)},
-            {
-                "$set": {
-                    "suggestedResources": formatted_recs,
-                    "status": "active", # Or whatever status indicates ready
-                    "updatedAt": datetime.datetime.utcnow()
-                }
-            }
-        )
+        logger.info("⏱️  Processing completed in %.2fs", elapsed)
+        return True
         
-        print(f"Job completed for IDP: {idp_id}")
+    except Exception as e:
+        if isinstance(e, orjson.JSONDecodeError):
+            logger.error("❌ Invalid JSON in job: %s", e)
+        else:
+            logger.warning("⚠️  Job failed: %s", e)
+        # Retry it, or park it in the dead-letter queue (malformed
+        # jobs go there directly, so they can't loop forever)
+        try:
+            target = await retry_job(job_json_bytes, str(e))
+            if target == DEAD_LETTER_QUEUE:
+                logger.error("🪦 Job moved to dead-letter queue")
+            elif target:
+                logger.warning("🔁 Job requeued for another attempt")
+        except Exception as retry_error:
+            logger.warning("⚠️  Worker Loop Error: %s", retry_error)
+            logger.warning("💡 Job remains in processing queue for recovery")
+        return False
+
+
+async def process_batch(batch):
+    """
+    Run a dequeued batch of jobs and remove the completed ones from the
+    processing queue.
+
+    Returns:
+        True if every job in the batch completed
+    """
+    # Drop cache entries the API invalidated since the last batch
+    await _apply_invalidations()
+    
+    # The shared data is loaded once for all of the batch's jobs. Failing
+    # to load it (database or Redis down, similarity build failed) isn't
+    # the jobs' fault, so they go back unchanged without using an attempt.
+    try:
+        ranking_data = await load_ranking_data()
+    except Exception as e:
+        logger.warning("⚠️  Couldn't load ranking data: %s", e)
+        for job_json_bytes in batch:
+            try:
+                await retry_job(job_json_bytes, str(e), count_attempt=False)
+            except Exception as retry_error:
+                logger.warning("⚠️  Worker Loop Error: %s", retry_error)
+                logger.warning("💡 Job remains in processing queue for recovery")
+        return False
+    
+    # The batch's jobs run concurrently (at most BATCH_SIZE at once), so
+    # their ranking uses several pool processes
+    completed = await asyncio.gather(*(run_job(job_json_bytes, ranking_data) for job_json_bytes in batch))
+    finished = [job_json_bytes for job_json_bytes, done in zip(batch, completed) if done]
+    
+    if not finished:
+        return False
+    
+    # ============================================================
+    # STEP 3: CLEANUP - Remove from Processing Queue
+    # ============================================================
+    # LREM removes the first occurrence of the value from the list
+    # Args: (key, count, value)
+    #   - count=1: remove first 1 occurrence from LEFT side
+    #   - count=-1: remove first 1 occurrence from RIGHT side
+    #   - count=0: remove ALL occurrences
+    # All removals for the batch, plus the completed-jobs counter, go out in
+    # a single round-trip.
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for job_json_bytes in finished:
+            pipe.lrem(PROCESSING_QUEUE, 1, job_json_bytes)
+        pipe.hdel(JOB_STARTED_KEY, *finished)
+        pipe.hdel(JOB_OWNER_KEY, *finished)
+        pipe.incrby(COMPLETED_COUNTER, len(finished))
+        await pipe.execute()
         
+        logger.info("🎉 %d job(s) completed and removed from processing queue", len(finished))
     except Exception as e:
-        print(f"Error processing job: {e}")
-        # Optionally update IDP status to 'failed'
+        logger.warning("⚠️  Worker Loop Error: %s", e)
+        logger.warning("💡 Jobs remain in processing queue for recovery")
+    return len(finished) == len(batch)
+
 
-def start_worker():
+async def start_worker():
     """
     Reliable Worker with Crash Recovery
     =====================================
     
-    This worker implements the "Reliable Queue" pattern using Redis BRPOPLPUSH.
+    This worker implements the "Reliable Queue" pattern using Redis RPOPLPUSH.
     
     WHY THIS MATTERS:
     -----------------
@@ -145,7 +760,7 @@ def start_worker():
     
     THE SOLUTION - The "Loop":
     ---------------------------
-    Instead of popping, we use BRPOPLPUSH which atomically:
+    Instead of popping, we use RPOPLPUSH which atomically:
     1. Pops job from main queue
     2. Pushes it to a "processing" queue
     3. Only after success, we remove it from processing queue
@@ -153,87 +768,94 @@ def start_worker():
     If the worker crashes mid-job, the job stays in the processing queue
     and can be recovered or retried.
     
+    RETRIES:
+    --------
+    A job that raises is pushed back onto the main queue with its
+    'attempts' count incremented; after MAX_JOB_ATTEMPTS it goes to the
+    dead-letter queue instead, where it can be inspected. A job left
+    running by a dead or hung worker is retried the same way by the
+    janitor task (requeue_stale_jobs) after JOB_TIMEOUT_SECONDS; jobs the
+    dead worker had dequeued but not started are simply requeued.
+    If the shared ranking data can't be loaded, the batch is requeued
+    without using attempts. After any failure the worker pauses before the
+    next batch, longer while failures continue.
+    
+    BATCHING:
+    ---------
+    Jobs are moved in batches of up to BATCH_SIZE by a Lua script (one
+    round-trip per batch), and the next batch is fetched by a background
+    task while the current one is processed. The jobs of a batch run
+    concurrently, ranking in parallel in the process pool. Completed jobs are removed
+    from the processing queue with one pipelined call per batch.
+    
     FLOW:
     -----
     recommendation_queue          recommendation_queue:processing
-    [job3, job2, job1]      →     [job1]  ← Being processed
-         ↓ BRPOPLPUSH              ↓ LREM (after success)
-    [job3, job2]                  []  ← Job complete, removed
+    [job3, job2, job1]      →     [job2, job1]  ← Being processed
+         ↓ RPOPLPUSH x N           ↓ LREM x N (after success, pipelined)
+    [job3]                        []  ← Jobs complete, removed
     """
     
-    # Name of our backup/processing queue
-    PROCESSING_QUEUE = f"{QUEUE_NAME}:processing"
+    global ranker_pool
+    ranker_pool = create_ranker_pool(RANKER_PROCESSES)
+    await invalidation_listener.subscribe(CACHE_INVALIDATE_CHANNEL)
     
-    print(f"🚀 Worker started successfully!")
-    print(f"📬 Listening on queue: {QUEUE_NAME}")
-    print(f"🔄 Processing queue: {PROCESSING_QUEUE}")
-    print(f"💾 Using Redis: {REDIS_URL}")
-    print("-" * 60)
+    logger.info("🚀 Worker started successfully!")
+    logger.info("📬 Listening on queue: %s", QUEUE_NAME)
+    logger.info("🔄 Processing queue: %s", PROCESSING_QUEUE)
+    logger.info("🪦 Dead-letter queue: %s (after %d attempts)", DEAD_LETTER_QUEUE, MAX_JOB_ATTEMPTS)
+    logger.info("📦 Batch size: %d", BATCH_SIZE)
+    logger.info("💾 Using Redis: %s", REDIS_URL)
+    
+    # Background task that retries jobs orphaned by dead workers
+    janitor = asyncio.create_task(requeue_stale_jobs())
+    
+    # Background task that keeps the next batch ready
+    next_batch = asyncio.create_task(fetch_batch())
+    backoff = 0
     
     while True:
+        # ============================================================
+        # STEP 1: ATOMIC POP & PUSH (The "Loop")
+        # ============================================================
+        # The batch is already safely in the processing queue. Start
+        # fetching the next one so Redis latency overlaps with our work.
         try:
-            # ============================================================
-            # STEP 1: ATOMIC POP & PUSH (The "Loop")
-            # ============================================================
-            # BRPOPLPUSH blocks until a job is available, then atomically:
-            # - Removes job from the RIGHT of QUEUE_NAME (FIFO order)
-            # - Pushes job to the LEFT of PROCESSING_QUEUE
-            # - Returns the job data
-            #
-            # timeout=0 means block indefinitely until a job arrives
-            job_json_bytes = redis_client.brpoplpush(
-                QUEUE_NAME, 
-                PROCESSING_QUEUE, 
-                timeout=0
-            )
-            
-            # If we get here, we have a job safely in the processing queue
-            if job_json_bytes:
-                job_json = job_json_bytes.decode('utf-8')
-                job = json.loads(job_json)
-                
-                # Log job details
-                user_id = job.get('data', {}).get('userId', 'unknown')
-                idp_id = job.get('data', {}).get('idpId', 'unknown')
-                print(f"\n✅ Job received - User: {user_id}, IDP: {idp_id}")
-                
-                # ============================================================
-                # STEP 2: DO THE WORK
-                # ============================================================
-                # The job is now safely in the processing queue.
-                # Even if we crash here, we won't lose the job.
-                start_time = time.time()
-                process_job(job.get('data'))
-                elapsed = time.time() - start_time
-                
-                print(f"⏱️  Processing completed in {elapsed:.2f}s")
-                
-                # ============================================================
-                # STEP 3: CLEANUP - Remove from Processing Queue
-                # ============================================================
-                # LREM removes the first occurrence of the value from the list
-                # Args: (key, count, value)
-                #   - count=1: remove first 1 occurrence from LEFT side
-                #   - count=-1: remove first 1 occurrence from RIGHT side
-                #   - count=0: remove ALL occurrences
-                redis_client.lrem(PROCESSING_QUEUE, 1, job_json)
-                
-                print(f"🎉 Job completed and removed from processing queue")
-                print("-" * 60)
-                
-        except json.JSONDecodeError as e:
-            print(f"❌ Invalid JSON in job: {e}")
-            # Malformed job - remove it to avoid infinite loop
-            try:
-                redis_client.lrem(PROCESSING_QUEUE, 1, job_json_bytes.decode('utf-8'))
-            except:
-                pass
-            
+            batch = await next_batch
         except Exception as e:
-            print(f"⚠️  Worker Loop Error: {e}")
-            print(f"💡 Job remains in processing queue for recovery")
+            logger.warning("⚠️  Worker Loop Error: %s", e)
             # Wait before retrying to avoid rapid failure loops
-            time.sleep(1)
+            await asyncio.sleep(1)
+            batch = []
+        next_batch = asyncio.create_task(fetch_batch())
+        
+        if not batch:
+            continue
+        
+        # ============================================================
+        # STEP 2 & 3: DO THE WORK, CLEANUP
+        # ============================================================
+        try:
+            if await process_batch(batch):
+                backoff = 0
+            else:
+                backoff = min(backoff * 2 or FAILURE_BACKOFF_SECONDS, MAX_FAILURE_BACKOFF_SECONDS)
+                logger.warning("⏸️  Batch had failures, pausing %ds", backoff)
+                await asyncio.sleep(backoff)
+        finally:
+            _held_jobs.difference_update(batch)
 
 if __name__ == "__main__":
-    start_worker()
+    log_listener = configure_logging()
+    try:
+        # uvloop isn't available on Windows, so fall back to asyncio there
+        if sys.platform == "win32":
+            asyncio.run(start_worker())
+        else:
+            import uvloop
+            uvloop.run(start_worker())
+    finally:
+        if ranker_pool is not None:
+            ranker_pool.shutdown()
+        release_shared_data()
+        log_listener.stop()